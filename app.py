@@ -1,5 +1,6 @@
 import os
 import sys
+import threading
 from flask import Flask, send_from_directory
 from asgiref.wsgi import WsgiToAsgi
 from config import Config
@@ -10,6 +11,21 @@ from routes.api_schema import schema_bp
 from routes.api_chat import chat_bp
 from routes.api_settings import settings_bp
 from services import settings_manager
+from services.connection_manager import preload_drivers
+
+try:
+    import uvloop  # noqa: F401  (not available on Windows)
+    _LOOP = "uvloop"
+except ImportError:
+    _LOOP = "asyncio"
+
+# Shared uvicorn options: C-accelerated event loop and HTTP parser
+UVICORN_KWARGS = {
+    "loop": _LOOP,
+    "http": "httptools",
+    "log_level": "warning",
+    "access_log": False,
+}
 
 
 def _base_dir():
@@ -19,6 +35,19 @@ def _base_dir():
     return os.path.dirname(__file__)
 
 
+def _start_warmup():
+    """Import the heavy database drivers in a background thread.
+
+    Skipped under gunicorn: it preloads the app in its master and forks, and
+    a fork while the thread holds an import lock deadlocks the worker
+    (gunicorn_conf.py imports the drivers synchronously instead).  The
+    arbiter sets SERVER_SOFTWARE before it loads the app.
+    """
+    if Config.DISABLE_WARMUP or os.environ.get("SERVER_SOFTWARE", "").startswith("gunicorn"):
+        return
+    threading.Thread(target=preload_drivers, daemon=True).start()
+
+
 def create_app():
     base = _base_dir()
     app = Flask(
@@ -33,6 +62,9 @@ def create_app():
     # Load persisted LLM settings into Config
     settings_manager.load()
 
+    # Import the heavy database drivers off the request path
+    _start_warmup()
+
     # Register blueprints
     app.register_blueprint(connections_bp, url_prefix="/api/connections")
     app.register_blueprint(database_bp, url_prefix="/api/db")
@@ -54,4 +86,4 @@ asgi_app = WsgiToAsgi(application)
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(asgi_app, host="0.0.0.0", port=5001)
+    uvicorn.run(asgi_app, host="0.0.0.0", port=5001, **UVICORN_KWARGS)
@@ -28,6 +28,8 @@ class Config:
     SECRET_KEY = os.getenv("FLASK_SECRET_KEY", "dev-secret-key")
     DATA_DIR = _resolve_data_dir()
     CONNECTIONS_FILE = os.path.join(DATA_DIR, "connections.json")
+    # Skip importing the database drivers in the background at startup
+    DISABLE_WARMUP = os.getenv("DISABLE_WARMUP", "").lower() in ("1", "true", "yes")
 
     # LLM
     LLM_API_KEY = os.getenv("LLM_API_KEY", "")
@@ -0,0 +1,39 @@
+"""
+Gunicorn configuration for production deployments.
+
+    gunicorn -c gunicorn_conf.py app:asgi_app
+
+Each worker is a uvicorn process serving the ASGI-wrapped Flask app; it
+picks up uvloop / httptools automatically when they are installed.
+Active database connections live in process memory (see ConnectionManager),
+so a connection opened in one worker is not visible to the others.  Keep a
+single worker unless requests are pinned to a worker (e.g. sticky sessions);
+set GUNICORN_WORKERS=auto to use the usual 2 * CPU + 1.
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "127.0.0.1:5001")
+worker_class = "uvicorn_worker.UvicornWorker"
+
+_workers = os.getenv("GUNICORN_WORKERS", "1")
+workers = multiprocessing.cpu_count() * 2 + 1 if _workers == "auto" else int(_workers)
+
+preload_app = True
+timeout = 120
+loglevel = "warning"
+
+
+def when_ready(server):
+    """Import the database drivers in the master before workers are forked.
+
+    Done synchronously: a background import still running at fork time
+    would leave the workers with a held import lock.  The forked workers
+    share the already-imported modules.
+    """
+    from config import Config
+    from services.connection_manager import preload_drivers
+
+    if not Config.DISABLE_WARMUP:
+        preload_drivers()
@@ -18,6 +18,9 @@ a = Analysis(
         'uvicorn.loops',
         'uvicorn.loops.auto',
         'uvicorn.loops.asyncio',
+        'uvicorn.loops.uvloop',
+        'uvloop',
+        'httptools',
         'uvicorn.protocols',
         'uvicorn.protocols.http',
         'uvicorn.protocols.http.auto',
@@ -34,6 +37,8 @@ a = Analysis(
         'asgiref.wsgi',
         # database drivers
         'pymysql',
+        'dbutils',
+        'dbutils.pooled_db',
         'pymongo',
         'elasticsearch',
         'sshtunnel',
@@ -43,6 +48,7 @@ a = Analysis(
         'run',
         'services',
         'services.connection_manager',
+        'services.atomic_file',
         'services.settings_manager',
         'services.llm_service',
         'services.mysql_service',
@@ -56,6 +62,7 @@ a = Analysis(
         'routes.api_schema',
         'routes.api_chat',
         'routes.api_settings',
+        'routes.json_response',
         # pywebview (native window)
         'webview',
         'webview.platforms',
@@ -65,6 +72,7 @@ a = Analysis(
         'webview.platforms.winforms',
         # stdlib / misc
         'dotenv',
+        'orjson',
     ],
     hookspath=[],
     hooksconfig={},
@@ -3,8 +3,7 @@ from services.connection_manager import manager
 from services.schema_indexer import indexer
 from services.llm_service import chat, chat_stream, resolve_references
 from services import mysql_service, mongo_service, elasticsearch_service
-import json
-import datetime
+from routes.json_response import dumps, ojsonify, stream_rows
 
 chat_bp = Blueprint("chat", __name__)
 
@@ -15,19 +14,6 @@ _SERVICE_MAP = {
 }
 
 
-class _Encoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, (datetime.date, datetime.datetime)):
-            return o.isoformat()
-        if isinstance(o, datetime.timedelta):
-            return str(o)
-        if isinstance(o, bytes):
-            return o.decode("utf-8", errors="replace")
-        if isinstance(o, set):
-            return list(o)
-        return super().default(o)
-
-
 @chat_bp.route("/send", methods=["POST"])
 def send_message():
     data = request.get_json()
@@ -45,10 +31,8 @@ def send_message():
     if messages and messages[-1]["role"] == "user":
         messages[-1]["content"] = resolve_references(messages[-1]["content"], schemas)
 
-    schema_text = indexer.build_schema_text(conn_id, database)
-
     try:
-        result = chat(messages, schema_text, db_type)
+        result = chat(messages, db_type=db_type, conn_id=conn_id, database=database)
         return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -71,14 +55,12 @@ def send_message_stream():
     if messages and messages[-1]["role"] == "user":
         messages[-1]["content"] = resolve_references(messages[-1]["content"], schemas)
 
-    schema_text = indexer.build_schema_text(conn_id, database)
-
     def generate():
         try:
-            yield from chat_stream(messages, schema_text, db_type)
+            yield from chat_stream(messages, db_type=db_type,
+                                   conn_id=conn_id, database=database)
         except Exception as e:
-            import json as _json
-            yield f"data: {_json.dumps({'type': 'error', 'content': str(e)})}\n\n"
+            yield b"data: " + dumps({"type": "error", "content": str(e)}) + b"\n\n"
 
     return Response(generate(), mimetype="text/event-stream",
                     headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -102,6 +84,8 @@ def execute_generated():
 
     try:
         result = svc.execute_query(conn_id, query_text, database)
-        return _Encoder().encode(result), 200, {"Content-Type": "application/json"}
+        if "rows" in result:
+            return stream_rows(result)
+        return ojsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 400
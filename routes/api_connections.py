@@ -3,18 +3,22 @@ from services.connection_manager import manager
 
 connections_bp = Blueprint("connections", __name__)
 
+# Keys never sent back to the client
+_REDACT = frozenset({"password"})
+
+
+def _redacted(c: dict) -> dict:
+    safe = {k: v for k, v in c.items() if k not in _REDACT}
+    safe["connected"] = manager.is_connected(c["id"])
+    ssh = c.get("ssh")
+    if ssh:
+        safe["ssh"] = {k: v for k, v in ssh.items() if k not in _REDACT}
+    return safe
+
 
 @connections_bp.route("", methods=["GET"])
 def list_connections():
-    configs = manager.list_configs()
-    result = []
-    for c in configs:
-        safe = {k: v for k, v in c.items() if k != "password"}
-        safe["connected"] = manager.is_connected(c["id"])
-        if "ssh" in c:
-            safe["ssh"] = {k: v for k, v in c["ssh"].items() if k != "password"}
-        result.append(safe)
-    return jsonify(result)
+    return jsonify([_redacted(c) for c in manager.list_configs()])
 
 
 @connections_bp.route("", methods=["POST"])
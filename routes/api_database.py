@@ -1,6 +1,9 @@
-from flask import Blueprint, request, jsonify
-from services.connection_manager import manager
+import functools
+import time
+from flask import Blueprint, Response, request, jsonify
+from services.connection_manager import manager, on_invalidate
 from services import mysql_service, mongo_service, elasticsearch_service
+from routes.json_response import dumps, ojsonify, stream_rows
 
 database_bp = Blueprint("database", __name__)
 
@@ -11,19 +14,51 @@ _SERVICE_MAP = {
 }
 
 
-def _svc(conn_id: str):
+@functools.lru_cache(maxsize=256)
+def _resolve(conn_id: str):
     db_type = manager.get_db_type(conn_id)
-    svc = _SERVICE_MAP.get(db_type)
+    return db_type, _SERVICE_MAP.get(db_type)
+
+
+on_invalidate(lambda conn_id: _resolve.cache_clear())
+
+
+def _svc(conn_id: str):
+    db_type, svc = _resolve(conn_id)
     if not svc:
         raise ValueError(f"Unsupported type: {db_type}")
     return svc
 
 
+# Serialized database / table lists, reused briefly so switching tabs
+# doesn't hit the server each time; key = (conn_id, database | None)
+_LIST_TTL = 5.0
+_list_cache: dict[tuple, tuple[float, bytes]] = {}
+
+
+@on_invalidate
+def _drop_list_cache(conn_id: str):
+    for key in list(_list_cache):
+        if key[0] == conn_id:
+            _list_cache.pop(key, None)
+
+
+def _cached_list(key: tuple, fetch) -> Response:
+    now = time.monotonic()
+    hit = _list_cache.get(key)
+    if hit and hit[0] > now:
+        payload = hit[1]
+    else:
+        payload = dumps(fetch())
+        _list_cache[key] = (now + _LIST_TTL, payload)
+    return Response(payload, mimetype="application/json")
+
+
 @database_bp.route("/<conn_id>/databases", methods=["GET"])
 def list_databases(conn_id):
     try:
-        dbs = _svc(conn_id).list_databases(conn_id)
-        return jsonify(dbs)
+        svc = _svc(conn_id)
+        return _cached_list((conn_id, None), lambda: svc.list_databases(conn_id))
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -31,8 +66,8 @@ def list_databases(conn_id):
 @database_bp.route("/<conn_id>/<database>/tables", methods=["GET"])
 def list_tables(conn_id, database):
     try:
-        tables = _svc(conn_id).list_tables(conn_id, database)
-        return jsonify(tables)
+        svc = _svc(conn_id)
+        return _cached_list((conn_id, database), lambda: svc.list_tables(conn_id, database))
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -41,7 +76,7 @@ def list_tables(conn_id, database):
 def table_structure(conn_id, database, table):
     try:
         structure = _svc(conn_id).get_table_structure(conn_id, database, table)
-        return jsonify(structure)
+        return ojsonify(structure)
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -53,7 +88,7 @@ def browse_data(conn_id, database, table):
         page_size = request.args.get("page_size", 50, type=int)
         result = _svc(conn_id).browse_data(conn_id, database, table,
                                             page=page, page_size=page_size)
-        return jsonify(result)
+        return stream_rows(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -61,10 +96,10 @@ def browse_data(conn_id, database, table):
 @database_bp.route("/<conn_id>/<database>/<table>/indexes", methods=["GET"])
 def table_indexes(conn_id, database, table):
     try:
-        db_type = manager.get_db_type(conn_id)
+        db_type, _ = _resolve(conn_id)
         if db_type == "mysql":
             indexes = mysql_service.get_table_indexes(conn_id, database, table)
-            return jsonify(indexes)
+            return ojsonify(indexes)
         return jsonify([])
     except Exception as e:
         return jsonify({"error": str(e)}), 400
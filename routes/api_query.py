@@ -1,9 +1,10 @@
+import functools
 from flask import Blueprint, request, jsonify
-from services.connection_manager import manager
+from services.connection_manager import manager, on_invalidate
 from services import mysql_service, mongo_service, elasticsearch_service
 from services.llm_service import is_write_operation
-import json
-import datetime
+from routes.json_response import ojsonify, stream_rows
+import orjson
 
 query_bp = Blueprint("query", __name__)
 
@@ -14,17 +15,13 @@ _SERVICE_MAP = {
 }
 
 
-class _Encoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, (datetime.date, datetime.datetime)):
-            return o.isoformat()
-        if isinstance(o, datetime.timedelta):
-            return str(o)
-        if isinstance(o, bytes):
-            return o.decode("utf-8", errors="replace")
-        if isinstance(o, set):
-            return list(o)
-        return super().default(o)
+@functools.lru_cache(maxsize=256)
+def _resolve(conn_id: str):
+    db_type = manager.get_db_type(conn_id)
+    return db_type, _SERVICE_MAP.get(db_type)
+
+
+on_invalidate(lambda conn_id: _resolve.cache_clear())
 
 
 @query_bp.route("/execute", methods=["POST"])
@@ -38,23 +35,31 @@ def execute():
     if not conn_id or not query_text:
         return jsonify({"error": "conn_id and query are required"}), 400
 
-    db_type = manager.get_db_type(conn_id)
+    db_type, svc = _resolve(conn_id)
+
+    # JSON-based queries are parsed once and shared with the service
+    query = query_text
+    if db_type in ("mongodb", "elasticsearch"):
+        try:
+            query = orjson.loads(query_text)
+        except orjson.JSONDecodeError:
+            pass  # the service reports invalid JSON
 
     # Safety: check for write operations
-    if is_write_operation(query_text, db_type) and not confirmed:
+    if is_write_operation(query, db_type) and not confirmed:
         return jsonify({
             "needs_confirmation": True,
             "message": "This is a write operation. Please confirm execution.",
             "query": query_text,
         }), 200
 
-    svc = _SERVICE_MAP.get(db_type)
     if not svc:
         return jsonify({"error": f"Unsupported type: {db_type}"}), 400
 
     try:
-        result = svc.execute_query(conn_id, query_text, database)
-        # Serialize with custom encoder for dates/bytes
-        return _Encoder().encode(result), 200, {"Content-Type": "application/json"}
+        result = svc.execute_query(conn_id, query, database)
+        if "rows" in result:
+            return stream_rows(result)
+        return ojsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -0,0 +1,70 @@
+"""
+Fast JSON responses backed by orjson.
+
+orjson handles date / datetime natively; json_default covers the remaining
+types returned by the database drivers and falls back to str() for anything
+else (e.g. bson Timestamp), as a streamed response cannot turn into a 400
+once the first row has been sent.
+"""
+
+import datetime
+import decimal
+
+import orjson
+from flask import Response, stream_with_context
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def json_default(o):
+    if isinstance(o, datetime.timedelta):
+        return str(o)
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if isinstance(o, (bytes, bytearray, memoryview)):
+        return bytes(o).decode("utf-8", errors="replace")
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    return str(o)
+
+
+def dumps(obj) -> bytes:
+    return orjson.dumps(obj, default=json_default, option=_OPTIONS)
+
+
+def ojsonify(obj, status: int = 200) -> Response:
+    """Drop-in for flask.jsonify on hot paths."""
+    return Response(dumps(obj), status=status, mimetype="application/json")
+
+
+def stream_rows(result: dict) -> Response:
+    """Stream *result* as JSON, serializing its ``rows`` one row at a time.
+
+    ``rows`` may be any iterable, e.g. a server-side cursor.  If *result*
+    carries a ``rowcount`` key it is set to the number of rows sent.  An
+    error while rows are being read still ends with valid JSON, carrying an
+    ``error`` key.  ``rows.close()`` (if any) is called when the stream ends;
+    the ASGI adapter never closes the response iterable, so this cannot be
+    left to ``call_on_close``.
+    """
+    rows = result.pop("rows")
+
+    def generate():
+        yield b'{"rows":['
+        count = 0
+        try:
+            for row in rows:
+                yield b"," + dumps(row) if count else dumps(row)
+                count += 1
+        except Exception as e:
+            result["error"] = str(e)
+        finally:
+            close = getattr(rows, "close", None)
+            if close:
+                close()
+        if "rowcount" in result:
+            result["rowcount"] = count
+        rest = dumps(result)
+        yield b"]," + rest[1:] if len(rest) > 2 else b"]}"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
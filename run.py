@@ -1,7 +1,7 @@
 """
 PyInstaller entry-point for OpenChatDB.
 
-Finds a free port, launches uvicorn in a background thread,
+Binds a free port, launches uvicorn on that socket in a background thread,
 and opens a native macOS / Windows window via pywebview.
 """
 
@@ -9,44 +9,46 @@ import socket
 import sys
 import threading
 import time
-import urllib.request
 
 import uvicorn
-from app import asgi_app
+from app import asgi_app, UVICORN_KWARGS
 
 
-def _find_free_port() -> int:
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.bind(("127.0.0.1", 0))
-        return s.getsockname()[1]
+def _bind_free_port() -> socket.socket:
+    """Bind an ephemeral port and keep the socket open for uvicorn.
 
+    Handing uvicorn the bound socket avoids the window in which another
+    process could grab a port that was probed and then released.
+    """
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(("127.0.0.1", 0))
+    return s
 
-def _wait_for_server(url: str, timeout: float = 30.0):
-    """Block until the server responds or timeout."""
+
+def _wait_for_server(server: uvicorn.Server, timeout: float = 30.0):
+    """Block until uvicorn has finished starting up or timeout."""
     deadline = time.monotonic() + timeout
     while time.monotonic() < deadline:
-        try:
-            urllib.request.urlopen(url, timeout=2)
+        if server.started:
             return True
-        except Exception:
-            time.sleep(0.25)
+        time.sleep(0.05)
     return False
 
 
-def _start_server(port: int):
-    uvicorn.run(asgi_app, host="127.0.0.1", port=port, log_level="warning")
-
-
 def main():
-    port = _find_free_port()
+    sock = _bind_free_port()
+    port = sock.getsockname()[1]
     url = f"http://127.0.0.1:{port}"
 
+    config = uvicorn.Config(asgi_app, host="127.0.0.1", port=port, **UVICORN_KWARGS)
+    server = uvicorn.Server(config)
+
     # Start uvicorn in a daemon thread
-    server_thread = threading.Thread(target=_start_server, args=(port,), daemon=True)
+    server_thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
     server_thread.start()
 
     # Wait for server to be ready
-    _wait_for_server(url)
+    _wait_for_server(server)
 
     # Open native window
     import webview
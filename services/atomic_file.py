@@ -0,0 +1,32 @@
+"""
+Crash-safe file replacement for the files under DATA_DIR.
+"""
+
+import os
+import tempfile
+
+
+def write_atomic(path: str, data: bytes):
+    """Write *data* to a temp file beside *path* and rename it over.
+
+    The temp file is fsynced before the rename, so a crash mid-write leaves
+    the previous file intact rather than a truncated one.  Each call gets its
+    own temp file (mode 0600 — these files hold credentials), so concurrent
+    writers cannot clobber each other's partial output.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".",
+                               suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
@@ -1,11 +1,16 @@
 import json
+import locale
 import os
 import uuid
 import threading
+import orjson
+from werkzeug.local import LocalProxy
 from config import Config
+from services.atomic_file import write_atomic
 
 # Lazy imports to avoid hard dependency if a driver isn't installed
 _pymysql = None
+_pooled_db = None
 _pymongo = None
 _elasticsearch = None
 _sshtunnel = None
@@ -19,6 +24,14 @@ def _import_pymysql():
     return _pymysql
 
 
+def _import_pooled_db():
+    global _pooled_db
+    if _pooled_db is None:
+        from dbutils.pooled_db import PooledDB
+        _pooled_db = PooledDB
+    return _pooled_db
+
+
 def _import_pymongo():
     global _pymongo
     if _pymongo is None:
@@ -43,35 +56,73 @@ def _import_sshtunnel():
     return _sshtunnel
 
 
+def preload_drivers():
+    """Import the database drivers ahead of the first connect.
+
+    Meant to run in a background thread at startup; drivers that are not
+    installed are skipped.
+    """
+    for load in (_import_pymysql, _import_pooled_db, _import_pymongo,
+                 _import_elasticsearch, _import_sshtunnel):
+        try:
+            load()
+        except ImportError:
+            pass
+
+
+# Callbacks run with a conn_id whenever its config changes or it disconnects,
+# so per-connection caches elsewhere can be dropped.
+_invalidate_hooks: list = []
+
+
+def on_invalidate(fn):
+    """Register *fn(conn_id)* as an invalidation hook; usable as a decorator."""
+    _invalidate_hooks.append(fn)
+    return fn
+
+
+def _invalidate(conn_id: str):
+    for fn in _invalidate_hooks:
+        fn(conn_id)
+
+
 class ConnectionManager:
     def __init__(self):
         self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
         # id -> {"config": {...}, "client": <conn>, "tunnel": <SSHTunnelForwarder|None>}
         self._active: dict = {}
         self._configs: list[dict] = self._load_configs()
+        # id -> config, kept in sync with self._configs for O(1) lookups
+        self._by_id: dict[str, dict] = {c["id"]: c for c in self._configs}
 
     # ---- persistence ----
     def _load_configs(self) -> list[dict]:
         path = Config.CONNECTIONS_FILE
-        if os.path.exists(path):
-            with open(path, "r") as f:
-                return json.load(f)
-        return []
+        if not os.path.exists(path):
+            return []
+        with open(path, "rb") as f:
+            raw = f.read()
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # Older versions wrote the file in the locale encoding (e.g. GBK
+            # on a Chinese Windows); read it that way and rewrite as UTF-8.
+            self._configs = json.loads(raw.decode(locale.getpreferredencoding(False)))
+            self._save_configs()
+            return self._configs
 
     def _save_configs(self):
-        os.makedirs(os.path.dirname(Config.CONNECTIONS_FILE), exist_ok=True)
-        with open(Config.CONNECTIONS_FILE, "w") as f:
-            json.dump(self._configs, f, indent=2, ensure_ascii=False)
+        # serialized so the file always ends up with the latest snapshot
+        with self._save_lock:
+            write_atomic(Config.CONNECTIONS_FILE, orjson.dumps(self._configs))
 
     # ---- CRUD ----
     def list_configs(self) -> list[dict]:
         return self._configs
 
     def get_config(self, conn_id: str) -> dict | None:
-        for c in self._configs:
-            if c["id"] == conn_id:
-                return c
-        return None
+        return self._by_id.get(conn_id)
 
     def save_config(self, cfg: dict) -> dict:
         if not cfg.get("id"):
@@ -81,13 +132,18 @@ class ConnectionManager:
             existing.update(cfg)
         else:
             self._configs.append(cfg)
+            self._by_id[cfg["id"]] = cfg
         self._save_configs()
+        _invalidate(cfg["id"])
         return cfg
 
     def delete_config(self, conn_id: str):
         self.disconnect(conn_id)
+        if self._by_id.pop(conn_id, None) is None:
+            return
         self._configs = [c for c in self._configs if c["id"] != conn_id]
         self._save_configs()
+        _invalidate(conn_id)
 
     # ---- connect / disconnect ----
     def _open_ssh_tunnel(self, cfg: dict):
@@ -108,24 +164,26 @@ class ConnectionManager:
         tunnel.start()
         return tunnel
 
-    def connect(self, conn_id: str) -> dict:
-        with self._lock:
-            if conn_id in self._active:
-                return {"status": "already_connected"}
-            cfg = self.get_config(conn_id)
-            if not cfg:
-                raise ValueError(f"Connection config {conn_id} not found")
+    def _open_client(self, cfg: dict):
+        """Open a driver client (and SSH tunnel, if configured) for *cfg*.
 
-            tunnel = self._open_ssh_tunnel(cfg)
-            host = "127.0.0.1" if tunnel else cfg.get("host", "127.0.0.1")
-            port = tunnel.local_bind_port if tunnel else int(cfg.get("port", 3306))
-
-            db_type = cfg.get("type", "mysql")
-            client = None
+        Returns (client, tunnel); the tunnel is None without SSH.
+        """
+        tunnel = self._open_ssh_tunnel(cfg)
+        host = "127.0.0.1" if tunnel else cfg.get("host", "127.0.0.1")
+        port = tunnel.local_bind_port if tunnel else int(cfg.get("port", 3306))
 
+        db_type = cfg.get("type", "mysql")
+        try:
             if db_type == "mysql":
                 pymysql = _import_pymysql()
-                client = pymysql.connect(
+                # pymysql connections are not thread-safe; hand each request its own
+                client = _import_pooled_db()(
+                    creator=pymysql,
+                    mincached=1,
+                    maxcached=4,
+                    maxconnections=10,
+                    blocking=True,
                     host=host,
                     port=port,
                     user=cfg.get("user", "root"),
@@ -158,10 +216,36 @@ class ConnectionManager:
                     kwargs["api_key"] = cfg["api_key"]
                 if cfg.get("verify_certs") is False:
                     kwargs["verify_certs"] = False
-                client = es.Elasticsearch(url, **kwargs)
+                client = es.Elasticsearch(url, connections_per_node=10, **kwargs)
             else:
                 raise ValueError(f"Unsupported db type: {db_type}")
+        except Exception:
+            self._close_client(None, tunnel)
+            raise
+        return client, tunnel
 
+    @staticmethod
+    def _close_client(client, tunnel):
+        if client is not None:
+            try:
+                client.close()
+            except Exception:
+                pass
+        if tunnel:
+            try:
+                tunnel.stop()
+            except Exception:
+                pass
+
+    def connect(self, conn_id: str) -> dict:
+        with self._lock:
+            if conn_id in self._active:
+                return {"status": "already_connected"}
+            cfg = self.get_config(conn_id)
+            if not cfg:
+                raise ValueError(f"Connection config {conn_id} not found")
+
+            client, tunnel = self._open_client(cfg)
             self._active[conn_id] = {
                 "config": cfg,
                 "client": client,
@@ -170,27 +254,16 @@ class ConnectionManager:
             return {"status": "connected"}
 
     def disconnect(self, conn_id: str):
+        if conn_id not in self._active:
+            return
+        # hooks run while the client is still usable, so they can release
+        # server-side state (e.g. Elasticsearch point-in-time cursors)
+        _invalidate(conn_id)
         with self._lock:
             entry = self._active.pop(conn_id, None)
             if not entry:
                 return
-            client = entry["client"]
-            db_type = entry["config"].get("type", "mysql")
-            try:
-                if db_type == "mysql":
-                    client.close()
-                elif db_type == "mongodb":
-                    client.close()
-                elif db_type == "elasticsearch":
-                    client.close()
-            except Exception:
-                pass
-            tunnel = entry.get("tunnel")
-            if tunnel:
-                try:
-                    tunnel.stop()
-                except Exception:
-                    pass
+            self._close_client(entry["client"], entry.get("tunnel"))
 
     def get_client(self, conn_id: str):
         entry = self._active.get(conn_id)
@@ -212,19 +285,27 @@ class ConnectionManager:
 
     def test_connection(self, cfg: dict) -> dict:
         """Test a connection without persisting it."""
-        temp_id = "__test__"
-        cfg_copy = {**cfg, "id": temp_id}
-        # temporarily add config
-        self._configs.append(cfg_copy)
         try:
-            self.connect(temp_id)
-            self.disconnect(temp_id)
-            return {"ok": True}
+            client, tunnel = self._open_client(cfg)
         except Exception as e:
             return {"ok": False, "error": str(e)}
-        finally:
-            self._configs = [c for c in self._configs if c["id"] != temp_id]
+        self._close_client(client, tunnel)
+        return {"ok": True}
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager() -> ConnectionManager:
+    """Return the singleton, loading connections.json on first use."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = ConnectionManager()
+    return _manager
 
 
-# Singleton
-manager = ConnectionManager()
+# Singleton; created lazily so importing the routes does no disk I/O
+manager: ConnectionManager = LocalProxy(get_manager)
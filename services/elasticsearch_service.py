@@ -1,5 +1,44 @@
-import json
-from services.connection_manager import manager
+import orjson
+import threading
+import time
+from collections import OrderedDict
+from services.connection_manager import manager, on_invalidate
+
+# from/size paging is capped at index.max_result_window (10000 hits) and gets
+# slower the deeper it goes, so pages past _DEEP_PAGE walk a point-in-time
+# snapshot with search_after instead.
+_DEEP_PAGE = 10
+_PIT_KEEP_ALIVE = "5m"
+
+_MAX_CURSORS = 64
+_cursor_lock = threading.Lock()
+# (conn_id, index, page_size) -> {"pit": <pit id>, "after": {page: sort values of its last hit}},
+# least recently used first
+_cursors: OrderedDict[tuple, dict] = OrderedDict()
+
+# Browse totals are counted on the first page and reused while paging on,
+# so later pages cost a single search.
+_COUNT_TTL = 30.0
+# (conn_id, index) -> (count, monotonic expiry)
+_counts: dict[tuple, tuple[int, float]] = {}
+
+
+@on_invalidate
+def _drop_counts(conn_id: str):
+    for key in list(_counts):
+        if key[0] == conn_id:
+            _counts.pop(key, None)
+
+
+def _browse_total(es, conn_id: str, index: str, page: int) -> int:
+    key = (conn_id, index)
+    cached = _counts.get(key)
+    now = time.monotonic()
+    if page > 1 and cached and cached[1] > now:
+        return cached[0]
+    total = es.count(index=index)["count"]
+    _counts[key] = (total, now + _COUNT_TTL)
+    return total
 
 
 def _client(conn_id: str):
@@ -14,47 +53,115 @@ def list_databases(conn_id: str) -> list[str]:
 def list_tables(conn_id: str, database: str = "_all") -> list[str]:
     """List indices as 'tables'."""
     es = _client(conn_id)
-    indices = list(es.indices.get(index="*").keys())
+    # _cat returns only the names instead of every index's mappings/settings;
     # filter out internal indices
-    return [i for i in indices if not i.startswith(".")]
+    return [i["index"] for i in es.cat.indices(format="json", h="index")
+            if not i["index"].startswith(".")]
 
 
 def get_table_structure(conn_id: str, database: str, index: str) -> list[dict]:
     es = _client(conn_id)
     mapping = es.indices.get_mapping(index=index)
-    properties = mapping[index]["mappings"].get("properties", {})
-    result = []
-    for field, info in properties.items():
-        result.append({
-            "Field": field,
-            "Type": info.get("type", "object"),
-            "Key": "",
-        })
-    return result
+    return _mapping_columns(mapping[index])
+
+
+def _mapping_columns(mapping: dict) -> list[dict]:
+    """Convert one index's get_mapping entry into column dicts."""
+    properties = mapping["mappings"].get("properties", {})
+    return [{"Field": field, "Type": info.get("type", "object"), "Key": ""}
+            for field, info in properties.items()]
+
+
+def _close_pit(conn_id: str, pit_id: str, es=None):
+    try:
+        (es or _client(conn_id)).close_point_in_time(id=pit_id)
+    except Exception:
+        # not connected any more or already expired; keep_alive reaps it
+        pass
+
+
+def _close_cursor(es, key: tuple):
+    with _cursor_lock:
+        state = _cursors.pop(key, None)
+    if state:
+        _close_pit(key[0], state["pit"], es)
+
+
+@on_invalidate
+def _drop_cursors(conn_id: str):
+    with _cursor_lock:
+        states = [_cursors.pop(k) for k in [k for k in _cursors if k[0] == conn_id]]
+    for state in states:
+        _close_pit(conn_id, state["pit"])
+
+
+def _deep_page_hits(es, key: tuple, index: str, page: int, page_size: int) -> list[dict]:
+    """Fetch *page* with search_after, resuming from the nearest known page."""
+    from elasticsearch import NotFoundError
+
+    with _cursor_lock:
+        state = _cursors.get(key)
+    for _ in range(2):
+        if state is None:
+            pit = es.open_point_in_time(index=index, keep_alive=_PIT_KEEP_ALIVE)
+            state = {"pit": pit["id"], "after": {}}
+        start = max((p for p in state["after"] if p < page), default=0)
+        hits = []
+        try:
+            for p in range(start + 1, page + 1):
+                kwargs = {"search_after": state["after"][p - 1]} if p > 1 else {}
+                resp = es.search(
+                    pit={"id": state["pit"], "keep_alive": _PIT_KEEP_ALIVE},
+                    sort=["_shard_doc"],
+                    size=page_size,
+                    track_total_hits=False,
+                    **kwargs,
+                )
+                state["pit"] = resp.get("pit_id", state["pit"])
+                hits = resp["hits"]["hits"]
+                if not hits:
+                    break
+                state["after"][p] = hits[-1]["sort"]
+        except NotFoundError:
+            # point-in-time expired; start over with a fresh one
+            state = None
+            continue
+        with _cursor_lock:
+            _cursors[key] = state
+            _cursors.move_to_end(key)
+            evicted = [_cursors.popitem(last=False) for _ in range(len(_cursors) - _MAX_CURSORS)]
+        for old_key, old in evicted:
+            _close_pit(old_key[0], old["pit"], es if old_key[0] == key[0] else None)
+        return hits if p == page else []
+    return []
 
 
 def browse_data(conn_id: str, database: str, index: str,
                 page: int = 1, page_size: int = 50) -> dict:
     es = _client(conn_id)
-    from_ = (page - 1) * page_size
-    resp = es.search(index=index, body={"query": {"match_all": {}}, "from": from_, "size": page_size})
-    hits = resp["hits"]
-    rows = []
-    for hit in hits["hits"]:
-        row = {"_id": hit["_id"], **hit["_source"]}
-        rows.append(row)
-    total = hits["total"]["value"] if isinstance(hits["total"], dict) else hits["total"]
+    key = (conn_id, index, page_size)
+    if page > _DEEP_PAGE:
+        hits = _deep_page_hits(es, key, index, page, page_size)
+    else:
+        # back near the top: drop any deep-paging snapshot so new docs show up
+        _close_cursor(es, key)
+        from_ = (page - 1) * page_size
+        resp = es.search(index=index, query={"match_all": {}}, from_=from_,
+                         size=page_size, track_total_hits=False)
+        hits = resp["hits"]["hits"]
+    rows = ({"_id": hit["_id"], **hit["_source"]} for hit in hits)
+    total = _browse_total(es, conn_id, index, page)
     return {"rows": rows, "total": total, "page": page, "page_size": page_size}
 
 
-def execute_query(conn_id: str, query_str: str, database: str | None = None) -> dict:
+def execute_query(conn_id: str, query_str: str | dict, database: str | None = None) -> dict:
     """Execute an ES query expressed as JSON.
 
     Format: {"index": "name", "body": {...ES query body...}}
     """
     try:
-        q = json.loads(query_str)
-    except json.JSONDecodeError as e:
+        q = orjson.loads(query_str) if isinstance(query_str, str) else query_str
+    except orjson.JSONDecodeError as e:
         return {"error": f"Invalid JSON: {e}"}
 
     es = _client(conn_id)
@@ -89,9 +196,8 @@ def execute_query(conn_id: str, query_str: str, database: str | None = None) ->
 
 
 def get_all_schemas(conn_id: str, database: str = "_all") -> list[dict]:
-    indices = list_tables(conn_id, database)
-    result = []
-    for idx in indices:
-        columns = get_table_structure(conn_id, database, idx)
-        result.append({"table": idx, "columns": columns})
-    return result
+    """Return all index schemas, fetching every mapping in a single request."""
+    es = _client(conn_id)
+    mappings = es.indices.get_mapping(index="*")
+    return [{"table": idx, "columns": _mapping_columns(mapping)}
+            for idx, mapping in mappings.items() if not idx.startswith(".")]
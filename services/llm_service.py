@@ -1,7 +1,47 @@
+import functools
+import hashlib
 import re
+import threading
+from collections import OrderedDict
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from config import Config
 
+_loads = orjson.loads
+
+
+def _sse(obj) -> bytes:
+    """Encode *obj* as one server-sent-events frame."""
+    return b"data: " + orjson.dumps(obj) + b"\n\n"
+
+
+# Token frames are sent once per streamed token; only the content varies,
+# so it is dropped between a fixed prefix and suffix.
+_TOKEN_PREFIX = b'data: {"type":"token","content":'
+_TOKEN_SUFFIX = b"}\n\n"
+
+# Shared session so consecutive chat turns reuse the TCP/TLS connection
+_session = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    # retry failed connects and the listed statuses only: a read timeout may
+    # mean the completion is still running (and billed) upstream
+    max_retries=Retry(
+        total=2,
+        connect=2,
+        read=0,
+        backoff_factor=0.2,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({"POST"}),
+        raise_on_status=False,
+    ),
+)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+
 SYSTEM_PROMPT_TEMPLATE = """You are a database assistant. The user will ask questions about a database and you should generate appropriate queries.
 
 Current database schema:
@@ -25,114 +65,175 @@ WRITE_PATTERNS = re.compile(
     re.IGNORECASE,
 )
 
+EXECUTABLE_SQL_PATTERN = re.compile(
+    r"^\s*(SELECT|INSERT|UPDATE|DELETE|CREATE|ALTER|DROP|TRUNCATE|REPLACE|"
+    r"WITH|EXPLAIN|SHOW|DESCRIBE|DESC|USE|SET|GRANT|REVOKE|BEGIN|COMMIT|"
+    r"ROLLBACK|CALL|EXECUTE|EXEC|MERGE)\b",
+    re.IGNORECASE,
+)
+
 MONGO_WRITE_METHODS = {"insertOne", "insertMany", "updateOne", "updateMany", "deleteOne", "deleteMany"}
 
+_CODE_BLOCK_RE = re.compile(r"```(\w*)\n(.*?)```", re.DOTALL)
+
+
+def _alternation(names) -> str:
+    """Regex alternation of *names*, longest first so prefixes don't shadow."""
+    return "|".join(map(re.escape, sorted(names, key=len, reverse=True)))
+
+
+@functools.lru_cache(maxsize=32)
+def _reference_pattern(table_names: frozenset, field_names: frozenset) -> re.Pattern | None:
+    """Compiled @table / #field pattern, reused across chats on the same schema."""
+    alternatives = []
+    if table_names:
+        alternatives.append("@(?P<table>" + _alternation(table_names) + r")(?!\w)")
+    if field_names:
+        alternatives.append("#(?P<field>" + _alternation(field_names) + r")(?!\w)")
+    return re.compile("|".join(alternatives)) if alternatives else None
+
 
 def resolve_references(text: str, schemas: list[dict]) -> str:
     """Expand @table and #field references to full names for clarity."""
+    if "@" not in text and "#" not in text:
+        return text
     table_names = {s["table"] for s in schemas}
     field_map: dict[str, str] = {}
     for s in schemas:
         for col in s.get("columns", []):
             fname = col.get("Field", "")
-            field_map[fname] = s["table"]
+            if fname:
+                field_map[fname] = s["table"]
 
-    # @table -> table
-    for t in table_names:
-        text = text.replace(f"@{t}", t)
+    # @table -> table, #field -> table.field, in a single pass
+    pattern = _reference_pattern(frozenset(table_names), frozenset(field_map))
+    if pattern is None:
+        return text
 
-    # #field -> table.field
-    for f, t in field_map.items():
-        text = text.replace(f"#{f}", f"{t}.{f}")
+    def _expand(m: re.Match) -> str:
+        name = m.group(m.lastgroup)
+        return name if m.lastgroup == "table" else f"{field_map[name]}.{name}"
 
-    return text
+    return pattern.sub(_expand, text)
 
 
 def extract_code_blocks(text: str) -> list[dict]:
     """Extract fenced code blocks from LLM response."""
-    pattern = re.compile(r"```(\w*)\n(.*?)```", re.DOTALL)
     results = []
-    for m in pattern.finditer(text):
+    for m in _CODE_BLOCK_RE.finditer(text):
         lang = m.group(1).lower()
         code = m.group(2).strip()
         results.append({"lang": lang, "code": code})
     return results
 
 
-EXECUTABLE_SQL_PATTERN = re.compile(
-    r"^\s*(SELECT|INSERT|UPDATE|DELETE|CREATE|ALTER|DROP|TRUNCATE|REPLACE|"
-    r"WITH|EXPLAIN|SHOW|DESCRIBE|DESC|USE|SET|GRANT|REVOKE|BEGIN|COMMIT|"
-    r"ROLLBACK|CALL|EXECUTE|EXEC|MERGE)\b",
-    re.IGNORECASE,
-)
-
-
 def is_executable_query(code: str, lang: str, db_type: str) -> bool:
     """Check whether a code block looks like an executable query."""
-    if not code or not code.strip():
+    stripped = code.strip() if code else ""
+    if not stripped:
         return False
     if db_type in ("mongodb", "elasticsearch"):
         # JSON-based queries — must be valid JSON object or array
-        stripped = code.strip()
         return (stripped.startswith("{") and stripped.endswith("}")) or \
                (stripped.startswith("[") and stripped.endswith("]"))
     # SQL-based: must start with a known statement keyword
-    return bool(EXECUTABLE_SQL_PATTERN.match(code.strip()))
+    return bool(EXECUTABLE_SQL_PATTERN.match(stripped))
+
 
+def is_write_operation(query: str | dict, db_type: str = "mysql") -> bool:
+    """Check whether *query* modifies data.
 
-def is_write_operation(query: str, db_type: str = "mysql") -> bool:
+    For MongoDB / Elasticsearch *query* may be the already-parsed JSON object.
+    """
     if db_type == "mysql":
         return bool(WRITE_PATTERNS.search(query))
-    elif db_type == "mongodb":
-        import json
-        try:
-            q = json.loads(query)
-            return q.get("method", "find") in MONGO_WRITE_METHODS
-        except Exception:
-            return False
-    elif db_type == "elasticsearch":
-        import json
+    elif db_type in ("mongodb", "elasticsearch"):
         try:
-            q = json.loads(query)
-            return q.get("method", "search") in ("index", "delete", "update")
+            if isinstance(query, str):
+                query = orjson.loads(query)
+            if db_type == "mongodb":
+                return query.get("method", "find") in MONGO_WRITE_METHODS
+            return query.get("method", "search") in ("index", "delete", "update")
         except Exception:
             return False
     return False
 
 
+@functools.lru_cache(maxsize=64)
+def _build_system_prompt(schema_text: str, db_type: str) -> str:
+    return SYSTEM_PROMPT_TEMPLATE.format(schema=schema_text, db_type=db_type)
+
+
 def _api_url(path: str) -> str:
     """Build full API URL, stripping whitespace and duplicate slashes."""
     base = Config.LLM_BASE_URL.strip().rstrip("/")
     return f"{base}{path}"
 
 
-def chat(messages: list[dict], schema_text: str, db_type: str) -> dict:
-    """Call LLM API (OpenAI-compatible) and return assistant response."""
-    system_msg = SYSTEM_PROMPT_TEMPLATE.format(schema=schema_text, db_type=db_type)
-    api_messages = [{"role": "system", "content": system_msg}] + messages
+def _uses_cache_control() -> bool:
+    """Whether the endpoint takes Anthropic-style ``cache_control`` blocks.
 
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {Config.LLM_API_KEY}",
-    }
-    payload = {
-        "model": Config.LLM_MODEL,
-        "messages": api_messages,
-        "max_tokens": Config.LLM_MAX_TOKENS,
-        "temperature": Config.LLM_TEMPERATURE,
-    }
+    Decided by the base URL only: OpenAI-compatible gateways also serve
+    claude-* models but may accept only string message content.
+    """
+    return "anthropic" in Config.LLM_BASE_URL.lower()
+
+
+def _api_messages(messages: list[dict], schema_text: str | None, db_type: str,
+                  conn_id: str | None, database: str | None) -> list[dict]:
+    """Prepend the system prompt, looking up the schema text if not given.
+
+    The system prompt only depends on (schema, db_type) and always comes
+    first, so the request starts with the same bytes every turn; that is
+    what provider-side prefix caching (OpenAI, DeepSeek) keys on.  For
+    Anthropic the prompt is also marked cacheable explicitly.
+    """
+    if schema_text is None:
+        # imported here: schema_indexer imports this module
+        from services.schema_indexer import indexer
+        schema_text = indexer.build_schema_text(conn_id, database)
+    system_msg = _build_system_prompt(schema_text, db_type)
+    if _uses_cache_control():
+        content = [{"type": "text", "text": system_msg, "cache_control": {"type": "ephemeral"}}]
+    else:
+        content = system_msg
+    return [{"role": "system", "content": content}] + messages
+
+
+# Exact-match cache of chat results, keyed by a digest of the full request
+# (endpoint, model, sampling settings, system prompt and messages).  Results
+# that contain a write query are never cached.
+_RESPONSE_CACHE_SIZE = 1024
+_response_cache: OrderedDict[bytes, dict] = OrderedDict()
+_response_lock = threading.Lock()
+
+
+def _response_key(payload: dict) -> bytes:
+    return hashlib.blake2b(Config.LLM_BASE_URL.encode() + orjson.dumps(payload),
+                           digest_size=16).digest()
 
-    resp = requests.post(
-        _api_url("/chat/completions"),
-        headers=headers,
-        json=payload,
-        timeout=60,
-    )
-    resp.raise_for_status()
-    data = resp.json()
-    content = data["choices"][0]["message"]["content"]
 
-    # Extract query blocks — use last block only if it's executable
+def _cached_response(key: bytes) -> dict | None:
+    with _response_lock:
+        result = _response_cache.get(key)
+        if result is not None:
+            _response_cache.move_to_end(key)
+            return dict(result)
+    return None
+
+
+def _store_response(key: bytes, result: dict):
+    if result["is_write"]:
+        return
+    with _response_lock:
+        _response_cache[key] = dict(result)
+        _response_cache.move_to_end(key)
+        while len(_response_cache) > _RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+
+
+def _chat_result(content: str, db_type: str) -> dict:
+    """Build the chat result, taking the last code block only if it's executable."""
     blocks = extract_code_blocks(content)
     query = None
     query_lang = None
@@ -152,12 +253,14 @@ def chat(messages: list[dict], schema_text: str, db_type: str) -> dict:
     }
 
 
-def chat_stream(messages: list[dict], schema_text: str, db_type: str):
-    """Streaming version of chat(). Yields SSE-formatted lines."""
-    import json as _json
+def chat(messages: list[dict], schema_text: str | None = None, db_type: str = "",
+         *, conn_id: str | None = None, database: str | None = None) -> dict:
+    """Call LLM API (OpenAI-compatible) and return assistant response.
 
-    system_msg = SYSTEM_PROMPT_TEMPLATE.format(schema=schema_text, db_type=db_type)
-    api_messages = [{"role": "system", "content": system_msg}] + messages
+    Pass either *schema_text* or *conn_id* / *database*, in which case the
+    indexer's cached schema text is used.
+    """
+    api_messages = _api_messages(messages, schema_text, db_type, conn_id, database)
 
     headers = {
         "Content-Type": "application/json",
@@ -168,59 +271,106 @@ def chat_stream(messages: list[dict], schema_text: str, db_type: str):
         "messages": api_messages,
         "max_tokens": Config.LLM_MAX_TOKENS,
         "temperature": Config.LLM_TEMPERATURE,
-        "stream": True,
     }
+    key = _response_key(payload)
+    cached = _cached_response(key)
+    if cached is not None:
+        return cached
 
-    full_content = ""
+    resp = _session.post(
+        _api_url("/chat/completions"),
+        headers=headers,
+        data=orjson.dumps(payload),
+        timeout=60,
+    )
+    resp.raise_for_status()
+    data = resp.json()
+    content = data["choices"][0]["message"]["content"]
+
+    result = _chat_result(content, db_type)
+    _store_response(key, result)
+    return result
+
+
+def _iter_sse_data(resp):
+    """Yield the raw ``data:`` payloads of an SSE response, as bytes.
+
+    Lines are split out of a byte buffer filled from iter_content; nothing
+    is decoded here, orjson parses the payloads as bytes.
+    """
+    buf = b""
+    for chunk in resp.iter_content(chunk_size=8192):
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            if line.startswith(b"data: "):
+                yield line[6:].strip()
+    if buf.startswith(b"data: "):
+        yield buf[6:].strip()
+
+
+def chat_stream(messages: list[dict], schema_text: str | None = None, db_type: str = "",
+                *, conn_id: str | None = None, database: str | None = None):
+    """Streaming version of chat(). Yields SSE frames as bytes."""
+    api_messages = _api_messages(messages, schema_text, db_type, conn_id, database)
+
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {Config.LLM_API_KEY}",
+    }
+    payload = {
+        "model": Config.LLM_MODEL,
+        "messages": api_messages,
+        "max_tokens": Config.LLM_MAX_TOKENS,
+        "temperature": Config.LLM_TEMPERATURE,
+    }
+    key = _response_key(payload)
+    cached = _cached_response(key)
+    if cached is not None:
+        # replay a cached answer as a single token followed by the result
+        yield _TOKEN_PREFIX + orjson.dumps(cached["content"]) + _TOKEN_SUFFIX
+        yield _sse({"type": "done", **cached})
+        return
+    payload["stream"] = True
+
+    parts: list[str] = []
+    finished = False
+    resp = None
 
     try:
-        resp = requests.post(
+        resp = _session.post(
             _api_url("/chat/completions"),
             headers=headers,
-            json=payload,
+            data=orjson.dumps(payload),
             timeout=120,
             stream=True,
         )
         resp.raise_for_status()
 
-        for line in resp.iter_lines(decode_unicode=True):
-            if not line:
-                continue
-            if not line.startswith("data: "):
-                continue
-            data_str = line[6:]
-            if data_str.strip() == "[DONE]":
+        for data in _iter_sse_data(resp):
+            if data == b"[DONE]":
+                finished = True
                 break
             try:
-                chunk = _json.loads(data_str)
+                chunk = _loads(data)
                 delta = chunk.get("choices", [{}])[0].get("delta", {})
                 token = delta.get("content", "")
                 if token:
-                    full_content += token
-                    yield f"data: {_json.dumps({'type': 'token', 'content': token})}\n\n"
-            except (_json.JSONDecodeError, IndexError, KeyError):
+                    parts.append(token)
+                    yield _TOKEN_PREFIX + orjson.dumps(token) + _TOKEN_SUFFIX
+            except (orjson.JSONDecodeError, IndexError, KeyError):
                 continue
 
-        # Stream finished — use last block only if it's executable
-        blocks = extract_code_blocks(full_content)
-        query = None
-        query_lang = None
-        is_write = False
-        if blocks:
-            candidate = blocks[-1]
-            if is_executable_query(candidate["code"], candidate["lang"], db_type):
-                query = candidate["code"]
-                query_lang = candidate["lang"]
-                is_write = is_write_operation(query, db_type)
-
-        done_payload = {
-            "type": "done",
-            "content": full_content,
-            "query": query,
-            "query_lang": query_lang,
-            "is_write": is_write,
-        }
-        yield f"data: {_json.dumps(done_payload)}\n\n"
+        # Stream finished
+        result = _chat_result("".join(parts), db_type)
+        if finished:
+            _store_response(key, result)
+        yield _sse({"type": "done", **result})
 
     except Exception as e:
-        yield f"data: {_json.dumps({'type': 'error', 'content': str(e)})}\n\n"
+        yield _sse({"type": "error", "content": str(e)})
+    finally:
+        # hand the connection back to the session pool, even if the client
+        # went away mid-stream
+        if resp is not None:
+            resp.close()
@@ -1,18 +1,43 @@
-import json
-from bson import ObjectId
+import itertools
+from collections import defaultdict
+import orjson
+from bson import Decimal128, ObjectId
+from pymongo.errors import OperationFailure
 from services.connection_manager import manager
 
 
-class _JSONEncoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, ObjectId):
-            return str(o)
-        return super().default(o)
+def _serialize(o):
+    """Convert a Mongo document to JSON-safe values, walking it in place.
+
+    Dates are left as-is for the response encoder.
+    """
+    if isinstance(o, dict):
+        return {k: _serialize(v) for k, v in o.items()}
+    if isinstance(o, (list, tuple)):
+        return [_serialize(v) for v in o]
+    if isinstance(o, (ObjectId, Decimal128)):
+        return str(o)
+    if isinstance(o, (bytes, bytearray)):
+        return o.decode("utf-8", "replace")
+    return o
+
+
+def _iter_serialized(cursor):
+    """Serialize documents lazily as *cursor* yields them.
+
+    The first document is fetched up front so query errors are raised here
+    rather than in the middle of a streamed response.
+    """
+    return _peek_serialized(cursor)[1]
 
 
-def _serialize(doc):
-    """Convert a Mongo document to JSON-safe dict."""
-    return json.loads(_JSONEncoder().encode(doc))
+def _peek_serialized(cursor):
+    """Return (first serialized document or None, lazy iterator over all)."""
+    first = next(cursor, None)
+    if first is None:
+        return None, iter(())
+    first = _serialize(first)
+    return first, itertools.chain((first,), (_serialize(d) for d in cursor))
 
 
 def _client(conn_id: str):
@@ -27,31 +52,74 @@ def list_tables(conn_id: str, database: str) -> list[str]:
     return _client(conn_id)[database].list_collection_names()
 
 
+# $type names -> the Python type names the client-side scan reports
+_BSON_TYPE_NAMES = {
+    "objectId": "ObjectId", "string": "str", "int": "int", "long": "Int64",
+    "double": "float", "decimal": "Decimal128", "bool": "bool", "date": "datetime",
+    "null": "NoneType", "object": "dict", "array": "list", "binData": "bytes",
+    "timestamp": "Timestamp", "regex": "Regex",
+}
+
+_STRUCTURE_SAMPLE = 20
+
+
+def _structure_pipeline(size: int) -> list[dict]:
+    """Pipeline emitting one (field, type) pair per distinct combination."""
+    return [
+        {"$sample": {"size": size}},
+        {"$project": {"k": {"$objectToArray": "$$ROOT"}}},
+        {"$unwind": {"path": "$k", "includeArrayIndex": "pos"}},
+        {"$group": {"_id": {"field": "$k.k", "type": {"$type": "$k.v"}},
+                    "pos": {"$min": "$pos"}}},
+    ]
+
+
 def get_table_structure(conn_id: str, database: str, collection: str) -> list[dict]:
-    """Sample documents to infer field names and types."""
+    """Sample documents to infer field names and types.
+
+    The sampling and type detection run server-side so only field/type
+    pairs cross the wire; servers without ``$sample`` / ``$objectToArray``
+    (< 3.6) fall back to scanning documents client-side.
+    """
     coll = _client(conn_id)[database][collection]
-    sample = list(coll.find().limit(20))
-    field_map: dict[str, set] = {}
-    for doc in sample:
-        for k, v in doc.items():
-            field_map.setdefault(k, set()).add(type(v).__name__)
+    try:
+        groups = list(coll.aggregate(_structure_pipeline(_STRUCTURE_SAMPLE)))
+    except OperationFailure:
+        field_map = _scan_field_types(coll.find().limit(_STRUCTURE_SAMPLE))
+    else:
+        field_map: dict[str, set] = defaultdict(set)
+        for g in sorted(groups, key=lambda g: g["pos"]):
+            t = g["_id"]["type"]
+            field_map[g["_id"]["field"]].add(_BSON_TYPE_NAMES.get(t, t))
     return [
         {"Field": k, "Type": "/".join(sorted(v)), "Key": "PRI" if k == "_id" else ""}
         for k, v in field_map.items()
     ]
 
 
+def _scan_field_types(docs) -> dict[str, set]:
+    field_map: dict[str, set] = defaultdict(set)
+    names: dict[type, str] = {}
+    for doc in docs:
+        for k, v in doc.items():
+            t = type(v)
+            tn = names.get(t)
+            if tn is None:
+                tn = names[t] = t.__name__
+            field_map[k].add(tn)
+    return field_map
+
+
 def browse_data(conn_id: str, database: str, collection: str,
                 page: int = 1, page_size: int = 50) -> dict:
     coll = _client(conn_id)[database][collection]
     total = coll.estimated_document_count()
     offset = (page - 1) * page_size
-    docs = list(coll.find().skip(offset).limit(page_size))
-    rows = [_serialize(d) for d in docs]
+    rows = _iter_serialized(coll.find().skip(offset).limit(page_size))
     return {"rows": rows, "total": total, "page": page, "page_size": page_size}
 
 
-def execute_query(conn_id: str, query_str: str, database: str | None = None) -> dict:
+def execute_query(conn_id: str, query_str: str | dict, database: str | None = None) -> dict:
     """Execute a MongoDB operation expressed as JSON.
 
     Expected format:
@@ -60,8 +128,8 @@ def execute_query(conn_id: str, query_str: str, database: str | None = None) ->
                        updateOne, updateMany, deleteOne, deleteMany.
     """
     try:
-        q = json.loads(query_str)
-    except json.JSONDecodeError as e:
+        q = orjson.loads(query_str) if isinstance(query_str, str) else query_str
+    except orjson.JSONDecodeError as e:
         return {"error": f"Invalid JSON query: {e}"}
 
     db = _client(conn_id)[database or "test"]
@@ -75,9 +143,12 @@ def execute_query(conn_id: str, query_str: str, database: str | None = None) ->
 
     if method == "find":
         projection = q.get("projection")
-        docs = list(coll.find(filt, projection).limit(limit))
-        rows = [_serialize(d) for d in docs]
-        return {"columns": list(rows[0].keys()) if rows else [], "rows": rows, "rowcount": len(rows)}
+        cursor = coll.find(filt, projection).limit(limit)
+        if limit > 0:
+            cursor = cursor.batch_size(min(limit, 500))
+        # rows are streamed off the cursor; rowcount is filled in as they are sent
+        first, rows = _peek_serialized(cursor)
+        return {"columns": list(first) if first else [], "rows": rows, "rowcount": None}
     elif method == "count":
         cnt = coll.count_documents(filt)
         return {"rows": [{"count": cnt}], "columns": ["count"], "rowcount": 1}
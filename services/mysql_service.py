@@ -1,83 +1,256 @@
-from services.connection_manager import manager
+import itertools
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from services.connection_manager import manager, on_invalidate
 
+# Keyset-pagination state, LRU-bounded: tables remembered, and page cursors
+# kept per (table, page_size)
+_BROWSE_TABLES = 256
+_BROWSE_PAGES = 1000
+_browse_lock = threading.Lock()
+# (conn_id, database, table) -> single-column primary key, or None
+_pk_cache: OrderedDict[tuple, str | None] = OrderedDict()
+# (conn_id, database, table, page_size) -> {page: primary key of its last row},
+# so the next page can seek past it instead of scanning an OFFSET
+_page_after: OrderedDict[tuple, dict] = OrderedDict()
 
-def _conn(conn_id: str):
-    return manager.get_client(conn_id)
+_MISSING = object()
 
+# Statements after which a table's primary key may have changed
+_DDL_PATTERN = re.compile(r"^\s*(ALTER|DROP|RENAME|CREATE|TRUNCATE)\b", re.IGNORECASE)
 
-def _ensure_db(conn_id: str, database: str):
-    c = _conn(conn_id)
-    c.select_db(database)
+
+def _lru_get(cache: OrderedDict, key, missing=None):
+    with _browse_lock:
+        if key not in cache:
+            return missing
+        cache.move_to_end(key)
+        return cache[key]
+
+
+def _lru_put(cache: OrderedDict, key, value):
+    with _browse_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > _BROWSE_TABLES:
+            cache.popitem(last=False)
+
+
+def _forget_browse_state(conn_id: str, database: str | None = None, table: str | None = None):
+    """Drop cached primary keys and page cursors matching the given prefix."""
+    prefix = tuple(p for p in (conn_id, database, table) if p is not None)
+    with _browse_lock:
+        for cache in (_pk_cache, _page_after):
+            for key in [k for k in cache if k[:len(prefix)] == prefix]:
+                del cache[key]
+
+
+@on_invalidate
+def _drop_browse_state(conn_id: str):
+    _forget_browse_state(conn_id)
+
+
+@contextmanager
+def _cursor(conn_id: str, database: str | None = None):
+    """Borrow a connection from the pool and yield a cursor on it.
+
+    The connection is returned to the pool when the block exits.
+    """
+    conn = manager.get_client(conn_id).connection()
+    try:
+        with conn.cursor() as cur:
+            if database:
+                cur.execute("USE `%s`" % database)
+            yield cur
+    finally:
+        conn.close()
+
+
+class _RowStream:
+    """Rows of an unbuffered (server-side) cursor, fetched while iterating.
+
+    Holds its pooled connection until exhausted or closed.
+    """
+
+    def __init__(self, conn, cur, on_last=None):
+        self._conn = conn
+        self._cur = cur
+        # called with the final row once the result is fully read
+        self._on_last = on_last
+
+    def __iter__(self):
+        row = None
+        try:
+            # fetchone rather than iterating the cursor: DBUtils' SteadyDBCursor
+            # is only iterable from 3.0.2 on
+            for row in iter(self._cur.fetchone, None):
+                yield row
+            if row is not None and self._on_last:
+                self._on_last(row)
+        finally:
+            self.close()
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            try:
+                self._cur.close()
+            finally:
+                conn.close()
+
+
+def _stream(conn_id: str, sql: str, database: str | None = None, args=None, on_last=None):
+    """Execute *sql* on a server-side cursor; return (cursor, _RowStream)."""
+    from pymysql.cursors import SSDictCursor
+    conn = manager.get_client(conn_id).connection()
+    try:
+        cur = conn.cursor(SSDictCursor)
+        if database:
+            cur.execute("USE `%s`" % database)
+        cur.execute(sql, args)
+    except Exception:
+        conn.close()
+        raise
+    return cur, _RowStream(conn, cur, on_last)
 
 
 def list_databases(conn_id: str) -> list[str]:
-    c = _conn(conn_id)
-    with c.cursor() as cur:
+    with _cursor(conn_id) as cur:
         cur.execute("SHOW DATABASES")
         return [row[next(iter(row))] for row in cur.fetchall()]
 
 
 def list_tables(conn_id: str, database: str) -> list[str]:
-    _ensure_db(conn_id, database)
-    c = _conn(conn_id)
-    with c.cursor() as cur:
+    with _cursor(conn_id, database) as cur:
         cur.execute("SHOW TABLES")
         return [row[next(iter(row))] for row in cur.fetchall()]
 
 
 def get_table_structure(conn_id: str, database: str, table: str) -> list[dict]:
-    _ensure_db(conn_id, database)
-    c = _conn(conn_id)
-    with c.cursor() as cur:
+    with _cursor(conn_id, database) as cur:
         cur.execute("DESCRIBE `%s`" % table)
         return cur.fetchall()
 
 
 def get_table_indexes(conn_id: str, database: str, table: str) -> list[dict]:
-    _ensure_db(conn_id, database)
-    c = _conn(conn_id)
-    with c.cursor() as cur:
+    with _cursor(conn_id, database) as cur:
         cur.execute("SHOW INDEX FROM `%s`" % table)
         return cur.fetchall()
 
 
+# Below this many estimated rows COUNT(*) is cheap enough to run exactly
+_EXACT_COUNT_BELOW = 100_000
+
+
+def _count_rows(cur, database: str, table: str, exact: bool) -> int:
+    """Row count of *table*, estimated from InnoDB statistics for big tables."""
+    if not exact:
+        cur.execute(
+            "SELECT TABLE_ROWS AS est FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s",
+            (database, table),
+        )
+        row = cur.fetchone()
+        # TABLE_ROWS is NULL for views
+        if row and row["est"] is not None and row["est"] >= _EXACT_COUNT_BELOW:
+            return row["est"]
+    cur.execute("SELECT COUNT(*) AS cnt FROM `%s`" % table)
+    return cur.fetchone()["cnt"]
+
+
+def _primary_key(cur, conn_id: str, database: str, table: str) -> str | None:
+    """Return the table's primary key column if it is a single column (cached)."""
+    key = (conn_id, database, table)
+    pk = _lru_get(_pk_cache, key, missing=_MISSING)
+    if pk is _MISSING:
+        cur.execute("SHOW KEYS FROM `%s` WHERE Key_name = 'PRIMARY'" % table)
+        cols = [r["Column_name"] for r in cur.fetchall()]
+        pk = cols[0] if len(cols) == 1 else None
+        _lru_put(_pk_cache, key, pk)
+    return pk
+
+
 def browse_data(conn_id: str, database: str, table: str,
-                page: int = 1, page_size: int = 50) -> dict:
-    _ensure_db(conn_id, database)
-    c = _conn(conn_id)
-    offset = (page - 1) * page_size
-    with c.cursor() as cur:
-        cur.execute("SELECT COUNT(*) AS cnt FROM `%s`" % table)
-        total = cur.fetchone()["cnt"]
-        cur.execute("SELECT * FROM `%s` LIMIT %s OFFSET %s" % (table, page_size, offset))
-        rows = cur.fetchall()
+                page: int = 1, page_size: int = 50, exact_count: bool = False,
+                after_pk=None, pk_col: str | None = None) -> dict:
+    """Return one page of *table*; ``rows`` is streamed from the server.
+
+    ``total`` is an estimate for large tables unless *exact_count* is set.
+    With a single-column primary key, pages are read by keyset (``pk > last
+    seen``) rather than OFFSET: *after_pk* gives the cursor explicitly,
+    otherwise the last key of the previous page is remembered from an
+    earlier call.  Tables without one fall back to LIMIT / OFFSET.
+    """
+    with _cursor(conn_id, database) as cur:
+        total = _count_rows(cur, database, table, exact_count)
+        pk_col = pk_col or _primary_key(cur, conn_id, database, table)
+
+    if not pk_col:
+        offset = (page - 1) * page_size
+        _, rows = _stream(conn_id, "SELECT * FROM `%s` LIMIT %s OFFSET %s" % (table, page_size, offset),
+                          database)
+        return {"rows": rows, "total": total, "page": page, "page_size": page_size}
+
+    cursors_key = (conn_id, database, table, page_size)
+    cursors = _lru_get(_page_after, cursors_key)
+    if cursors is None:
+        cursors = {}
+        _lru_put(_page_after, cursors_key, cursors)
+    if after_pk is None and page > 1:
+        after_pk = cursors.get(page - 1)
+
+    def remember(last_row):
+        with _browse_lock:
+            cursors[page] = last_row[pk_col]
+            if len(cursors) > _BROWSE_PAGES:
+                del cursors[next(iter(cursors))]
+
+    if after_pk is not None:
+        sql = "SELECT * FROM `%s` WHERE `%s` > %%s ORDER BY `%s` LIMIT %%s" % (table, pk_col, pk_col)
+        args = (after_pk, page_size)
+    else:
+        sql = "SELECT * FROM `%s` ORDER BY `%s` LIMIT %%s OFFSET %%s" % (table, pk_col)
+        args = (page_size, (page - 1) * page_size)
+    try:
+        _, rows = _stream(conn_id, sql, database, args, on_last=remember)
+    except Exception:
+        # e.g. the key column was renamed or dropped; look it up again next time
+        _forget_browse_state(conn_id, database, table)
+        raise
     return {"rows": rows, "total": total, "page": page, "page_size": page_size}
 
 
 def execute_query(conn_id: str, sql: str, database: str | None = None) -> dict:
-    if database:
-        _ensure_db(conn_id, database)
-    c = _conn(conn_id)
-    with c.cursor() as cur:
-        cur.execute(sql)
-        if cur.description:
-            columns = [d[0] for d in cur.description]
-            rows = cur.fetchall()
-            return {"columns": columns, "rows": rows, "rowcount": len(rows)}
-        else:
-            return {"affected_rows": cur.rowcount}
+    """Run *sql*; result sets are streamed and ``rowcount`` is filled in by the consumer."""
+    cur, rows = _stream(conn_id, sql, database)
+    if _DDL_PATTERN.match(sql):
+        _forget_browse_state(conn_id, database)
+    if cur.description:
+        columns = [d[0] for d in cur.description]
+        return {"columns": columns, "rows": rows, "rowcount": None}
+    affected = cur.rowcount
+    rows.close()
+    return {"affected_rows": affected}
 
 
 def get_all_schemas(conn_id: str, database: str) -> list[dict]:
-    """Return all table schemas for the given database."""
-    _ensure_db(conn_id, database)
-    c = _conn(conn_id)
+    """Return all table schemas for the given database.
+
+    Columns come from one information_schema query, aliased to the keys
+    ``DESCRIBE`` returns, rather than one ``DESCRIBE`` per table.
+    """
+    with _cursor(conn_id) as cur:
+        cur.execute(
+            "SELECT TABLE_NAME AS tbl, COLUMN_NAME AS `Field`, COLUMN_TYPE AS `Type`, "
+            "IS_NULLABLE AS `Null`, COLUMN_KEY AS `Key`, COLUMN_DEFAULT AS `Default`, "
+            "EXTRA AS `Extra` FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = %s ORDER BY TABLE_NAME, ORDINAL_POSITION",
+            (database,),
+        )
+        rows = cur.fetchall()
     tables_info = []
-    with c.cursor() as cur:
-        cur.execute("SHOW TABLES")
-        table_names = [row[next(iter(row))] for row in cur.fetchall()]
-        for tbl in table_names:
-            cur.execute("DESCRIBE `%s`" % tbl)
-            columns = cur.fetchall()
-            tables_info.append({"table": tbl, "columns": columns})
+    for tbl, cols in itertools.groupby(rows, key=lambda r: r.pop("tbl")):
+        tables_info.append({"table": tbl, "columns": list(cols)})
     return tables_info
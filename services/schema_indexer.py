@@ -1,6 +1,8 @@
 import threading
+from typing import NamedTuple
 from services.connection_manager import manager
 from services import mysql_service, mongo_service, elasticsearch_service
+from services import llm_service
 
 _SERVICE_MAP = {
     "mysql": mysql_service,
@@ -9,27 +11,67 @@ _SERVICE_MAP = {
 }
 
 
+class _Snapshot(NamedTuple):
+    """Everything derived from one index() run of a (conn_id, database)."""
+    schemas: list[dict]        # [{table, columns}]
+    search_index: tuple        # see _build_search_index
+    text: str                  # prompt text for build_schema_text
+
+
 class SchemaIndexer:
-    """In-memory cache of database schemas for autocomplete."""
+    """In-memory cache of database schemas for autocomplete.
+
+    Readers take no lock: index() builds a new snapshot and publishes it by
+    swapping in a new dict, so a reader sees either the old or the new one.
+    """
 
     def __init__(self):
+        # serializes the copy-and-swap in index(); readers never take it
         self._lock = threading.Lock()
-        # key = (conn_id, database), value = list[{table, columns}]
-        self._cache: dict[tuple[str, str], list[dict]] = {}
+        # key = (conn_id, database), value = _Snapshot; replaced, never mutated
+        self._snapshots: dict[tuple[str, str], _Snapshot] = {}
 
     def index(self, conn_id: str, database: str) -> list[dict]:
+        return self._index(conn_id, database).schemas
+
+    def _index(self, conn_id: str, database: str) -> _Snapshot:
         db_type = manager.get_db_type(conn_id)
         svc = _SERVICE_MAP.get(db_type)
         if not svc:
             raise ValueError(f"Unsupported db type: {db_type}")
         schemas = svc.get_all_schemas(conn_id, database)
+        snap = _Snapshot(schemas, self._build_search_index(schemas),
+                         self._format_text(database, schemas))
         with self._lock:
-            self._cache[(conn_id, database)] = schemas
-        return schemas
+            self._snapshots = {**self._snapshots, (conn_id, database): snap}
+        # prompts built from the previous schema text are no longer needed
+        llm_service._build_system_prompt.cache_clear()
+        return snap
+
+    @staticmethod
+    def _build_search_index(schemas: list[dict]) -> tuple:
+        """Lowercased names plus ready-made search results, one entry per table.
+
+        Each field carries both display forms: "table.field" for a global
+        search and bare "field" when the search is scoped to its table.
+        """
+        entries = []
+        for tbl in schemas:
+            tbl_name = tbl["table"]
+            table_hit = {"type": "table", "table": tbl_name, "field": None, "display": tbl_name}
+            fields = []
+            for col in tbl.get("columns", []):
+                f = col.get("Field", "")
+                hit = {"type": "field", "table": tbl_name, "field": f}
+                fields.append((f.lower(),
+                               {**hit, "display": f"{tbl_name}.{f}"},
+                               {**hit, "display": f}))
+            entries.append((tbl_name.lower(), table_hit, tuple(fields)))
+        return tuple(entries)
 
     def get_schemas(self, conn_id: str, database: str) -> list[dict]:
-        with self._lock:
-            return self._cache.get((conn_id, database), [])
+        snap = self._snapshots.get((conn_id, database))
+        return snap.schemas if snap else []
 
     def search(self, conn_id: str, database: str, query: str, kind: str = "all", table: str = None) -> list[dict]:
         """Fuzzy search tables and fields.
@@ -38,37 +80,39 @@ class SchemaIndexer:
         table: if specified, only return fields from this table
         Returns list of {"type": "table"|"field", "table": ..., "field": ..., "display": ...}
         """
-        schemas = self.get_schemas(conn_id, database)
+        snap = self._snapshots.get((conn_id, database))
+        entries = snap.search_index if snap else ()
         q = query.lower()
+        table_lc = table.lower() if table else None
+        want_tables = kind in ("table", "all")
+        want_fields = kind in ("field", "all")
+        field_form = 2 if table else 1
         results = []
-        for tbl in schemas:
-            tbl_name = tbl["table"]
-            if kind in ("table", "all") and q in tbl_name.lower():
-                results.append({
-                    "type": "table",
-                    "table": tbl_name,
-                    "field": None,
-                    "display": tbl_name,
-                })
-            if kind in ("field", "all"):
-                if table and tbl_name.lower() != table.lower():
+        for tbl_lc, table_hit, fields in entries:
+            if want_tables and q in tbl_lc:
+                results.append(table_hit)
+            if want_fields:
+                if table_lc is not None and tbl_lc != table_lc:
                     continue
-                for col in tbl.get("columns", []):
-                    field_name = col.get("Field", "")
-                    if q in field_name.lower():
-                        results.append({
-                            "type": "field",
-                            "table": tbl_name,
-                            "field": field_name,
-                            "display": field_name if table else f"{tbl_name}.{field_name}",
-                        })
+                if not q:
+                    # autocomplete right after '#': every field matches
+                    results.extend(f[field_form] for f in fields)
+                    continue
+                for f in fields:
+                    if q in f[0]:
+                        results.append(f[field_form])
         return results
 
     def build_schema_text(self, conn_id: str, database: str) -> str:
-        """Build a compact text representation of all schemas for LLM prompts."""
-        schemas = self.get_schemas(conn_id, database)
-        if not schemas:
-            schemas = self.index(conn_id, database)
+        """Return a compact text representation of all schemas for LLM prompts.
+
+        The text is built once per index() and cached.
+        """
+        snap = self._snapshots.get((conn_id, database)) or self._index(conn_id, database)
+        return snap.text
+
+    @staticmethod
+    def _format_text(database: str, schemas: list[dict]) -> str:
         lines = [f"Database: {database}", ""]
         for tbl in schemas:
             cols = ", ".join(
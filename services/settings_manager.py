@@ -4,13 +4,17 @@ Persistent LLM settings manager.
 Reads / writes  DATA_DIR/settings.json  and keeps Config.LLM_* in sync.
 """
 
-import json
 import os
 import threading
+import orjson
 from config import Config
+from services.atomic_file import write_atomic
 
 _SETTINGS_FILE = os.path.join(Config.DATA_DIR, "settings.json")
 _lock = threading.Lock()
+# Parsed contents of settings.json; this module is its only writer, so it is
+# read once by load() and kept in memory after that.  None until loaded.
+_current: dict | None = None
 
 # Keys we manage (mapped to Config class-attribute names)
 _KEYS = {
@@ -25,14 +29,12 @@ _KEYS = {
 def _read_file() -> dict:
     if not os.path.isfile(_SETTINGS_FILE):
         return {}
-    with open(_SETTINGS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(_SETTINGS_FILE, "rb") as f:
+        return orjson.loads(f.read())
 
 
 def _write_file(data: dict):
-    os.makedirs(os.path.dirname(_SETTINGS_FILE), exist_ok=True)
-    with open(_SETTINGS_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    write_atomic(_SETTINGS_FILE, orjson.dumps(data, option=orjson.OPT_INDENT_2))
 
 
 def _apply_to_config(data: dict):
@@ -54,22 +56,22 @@ def _apply_to_config(data: dict):
 
 def load():
     """Load settings.json (if any) and override Config.LLM_* values."""
+    global _current
     with _lock:
-        data = _read_file()
-        if data:
-            _apply_to_config(data)
+        _current = _read_file()
+        if _current:
+            _apply_to_config(_current)
 
 
 def get_settings() -> dict:
     """Return current settings with the API key masked."""
-    with _lock:
-        return {
-            "api_key":     _mask_key(Config.LLM_API_KEY),
-            "base_url":    Config.LLM_BASE_URL,
-            "model":       Config.LLM_MODEL,
-            "max_tokens":  Config.LLM_MAX_TOKENS,
-            "temperature": Config.LLM_TEMPERATURE,
-        }
+    return {
+        "api_key":     _mask_key(Config.LLM_API_KEY),
+        "base_url":    Config.LLM_BASE_URL,
+        "model":       Config.LLM_MODEL,
+        "max_tokens":  Config.LLM_MAX_TOKENS,
+        "temperature": Config.LLM_TEMPERATURE,
+    }
 
 
 def update_settings(data: dict) -> dict:
@@ -79,8 +81,9 @@ def update_settings(data: dict) -> dict:
     - Empty string for api_key means "keep existing".
     - Returns the (masked) settings after update.
     """
+    global _current
     with _lock:
-        current = _read_file()
+        current = dict(_current) if _current is not None else _read_file()
 
         for json_key in _KEYS:
             if json_key not in data:
@@ -101,6 +104,7 @@ def update_settings(data: dict) -> dict:
             current[json_key] = value
 
         _write_file(current)
+        _current = current
         _apply_to_config(current)
 
     return get_settings()
@@ -11,6 +11,11 @@ const API = {
     if (!resp.ok && !data.needs_confirmation) {
       throw new Error(data.error || `HTTP ${resp.status}`);
     }
+    // Row results are streamed, so a read that fails part-way arrives as a
+    // 200 carrying the rows sent so far plus an error
+    if (data.error && Array.isArray(data.rows)) {
+      throw new Error(data.error);
+    }
     return data;
   },
 